@@ -5,19 +5,95 @@ This service handles the execution of agents following the Reasoning-Acting-Obse
 with LLM-based reasoning and actions.
 """
 
-import json
+import asyncio
 import logging
-from typing import Any, Dict, List, Optional
-
-from opperai import AsyncOpper, trace
-from pydantic import BaseModel, Field, field_validator
+import textwrap
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Final,
+    List,
+    Literal,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    get_args,
+)
+
+import orjson
+from pydantic import BaseModel, Field, ValidationError, create_model
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize Opper client
-opper = AsyncOpper()
+
+# Static instructions for the reasoning step in the ReAct pattern
+_REASONING_INSTRUCTIONS: Final[str] = textwrap.dedent(
+    """
+    You are in the REASONING phase of a ReAct (Reasoning-Acting-Observation) loop.
+
+    In this phase, you should:
+    1. Analyze the current state and context
+    2. Think step-by-step about what you know and what you need to find out
+    3. Consider what tools or actions might be helpful
+    4. Determine your next steps
+
+    Your reasoning should be thorough, logical, and clear. It will be used to decide
+    what action to take next in the ReAct loop.
+
+    Additionally, you should provide a confidence score from 0.0 to 1.0 indicating how
+    confident you are in your reasoning:
+    - 0.0-0.3: Low confidence - you have very limited information and high uncertainty
+    - 0.4-0.7: Medium confidence - you have some information but still have uncertainties
+    - 0.8-1.0: High confidence - you have sufficient information to make a well-informed decision
+
+    This confidence score helps track the quality of the decision-making process.
+
+    Finally, state the action you intend to take next (next_action_type "use_tool"
+    or "finish") and, when using a tool, which one (next_tool_name) and with which
+    parameters (next_tool_params).
+    """
+)
+
+# Static instructions for the action selection step in the ReAct pattern
+_ACTION_INSTRUCTIONS: Final[str] = textwrap.dedent(
+    """
+    You are in the ACTION SELECTION phase of a ReAct (Reasoning-Acting-Observation) loop.
+
+    Based on your prior reasoning, you must now decide on the next action to take.
+
+    You have two options:
+    1. Use a tool to gather more information or make progress:
+       - action_type: "use_tool"
+       - tool_name: Select from the available tools in the input
+       - tool_params: Provide the necessary parameters for the tool
+
+    2. Finish the task if you have enough information:
+       - action_type: "finish"
+       - output: Provide your final review with:
+         - review_summary: A concise summary of the PR changes
+         - issues_found: A list of issues or concerns
+         - suggestions: A list of improvement suggestions
+         - overall_assessment: Your final assessment of the PR
+
+    Choose your action carefully based on your reasoning and the current context.
+    """
+)
+
+# Static instructions for compressing a completed step into a memento
+_SUMMARY_INSTRUCTIONS: Final[str] = textwrap.dedent(
+    """
+    Summarize the result of a tool call made during a ReAct loop.
+
+    Keep every fact that later reasoning may depend on (names, numbers, file
+    names, errors, notable code changes) and drop everything else. The summary
+    must be at most 200 tokens.
+    """
+)
 
 
 class AgentReasoning(BaseModel):
@@ -32,14 +108,15 @@ class AgentReasoning(BaseModel):
         ge=0.0,
         le=1.0,
     )
-
-    @field_validator("confidence")
-    @classmethod
-    def validate_confidence(cls, v: float) -> float:
-        """Ensure confidence is between 0 and 1."""
-        if v < 0.0 or v > 1.0:
-            raise ValueError("Confidence must be between 0.0 and 1.0")
-        return v
+    next_action_type: Optional[str] = Field(
+        None, description="The action you intend to take next: 'use_tool' or 'finish'"
+    )
+    next_tool_name: Optional[str] = Field(
+        None, description="Name of the tool you intend to use next, if any"
+    )
+    next_tool_params: Optional[Dict[str, Any]] = Field(
+        None, description="Parameters for the tool you intend to use next, if any"
+    )
 
 
 class AgentAction(BaseModel):
@@ -68,33 +145,228 @@ class AgentOutput(BaseModel):
     overall_assessment: str = Field(..., description="Overall assessment of the PR")
 
 
+class FinishAction(BaseModel):
+    """Model for action selection output when the agent must finish."""
+
+    action_type: Literal["finish"] = Field(
+        "finish", description="Type of action: always 'finish'"
+    )
+    output: AgentOutput = Field(..., description="Final output")
+
+
+class StepMemento(BaseModel):
+    """Model for a compressed summary of a completed ReAct step."""
+
+    summary: str = Field(
+        ...,
+        description="Dense summary (at most 200 tokens) of the facts observed in this step",
+    )
+
+
+def _json_default(value: Any) -> Any:
+    """Serialize Pydantic models that orjson doesn't handle natively."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
 def to_json_str(obj: Any) -> str:
-    """Convert an object to a formatted JSON string."""
+    """Convert an object to a JSON string, indented only when debug logging is on."""
+    option = orjson.OPT_NON_STR_KEYS
+    if logger.isEnabledFor(logging.DEBUG):
+        option |= orjson.OPT_INDENT_2
     try:
-        return json.dumps(obj, indent=2)
+        return orjson.dumps(obj, default=_json_default, option=option).decode()
     except (TypeError, ValueError):
         return str(obj)
 
 
+def _json_fragment(obj: Any) -> str:
+    """Serialize an object to compact JSON, stringifying unsupported values."""
+    return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+def _trim_long_strings(value: Any, max_length: int = 2048) -> Any:
+    """Replace strings longer than max_length with a head/tail preview, recursively."""
+    if isinstance(value, str) and len(value) > max_length:
+        half = max_length // 2
+        omitted = len(value) - 2 * half
+        return f"{value[:half]}\n... ({omitted} characters omitted) ...\n{value[-half:]}"
+    if isinstance(value, dict):
+        return {k: _trim_long_strings(v, max_length) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_trim_long_strings(v, max_length) for v in value]
+    return value
+
+
+class _ContextJSON:
+    """JSON view of the context the reasoning and action calls receive.
+
+    History records are append-only, so each one is serialized once and reused
+    instead of re-encoding the whole history on every cycle.
+    """
+
+    def __init__(self, input_data: Dict[str, Any]):
+        self._prefix = '{"input": ' + _json_fragment(input_data)
+        self._history_json: List[str] = []
+        self._first_record: Optional[Dict[str, Any]] = None
+
+    def render(self, context: Dict[str, Any]) -> str:
+        """Assemble the JSON for the current context."""
+        history = context["history"]
+        # The history is replaced by a single record when it is collapsed
+        if len(history) < len(self._history_json) or (
+            history and history[0] is not self._first_record
+        ):
+            self._history_json = []
+        for record in history[len(self._history_json) :]:
+            self._history_json.append(_json_fragment(record))
+        self._first_record = history[0] if history else None
+
+        return (
+            f'{self._prefix}, "history": [{", ".join(self._history_json)}], '
+            f'"step_number": {context["current_step"]}, '
+            f'"new_observation": {_json_fragment(context.get("last_observation"))}}}'
+        )
+
+
+async def _cancel_task(task: "asyncio.Task[Any]") -> None:
+    """Cancel a task and wait for it, discarding its result or exception."""
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        current = asyncio.current_task()
+        if current is not None and current.cancelling():
+            raise
+    except Exception:
+        pass
+
+
+def _model_fields(schema: Type[BaseModel]) -> Set[str]:
+    """Names of the fields in a schema whose type is (or wraps) a Pydantic model."""
+
+    def is_model(annotation: Any) -> bool:
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            return True
+        return any(is_model(arg) for arg in get_args(annotation))
+
+    return {
+        name
+        for name, field in schema.model_fields.items()
+        if is_model(field.annotation)
+    }
+
+
 class AgentRunnerService:
     """Service for running agents using the ReAct pattern."""
 
     def __init__(self):
+        # Import opperai here rather than at module level to keep startup fast
+        from opperai import AsyncOpper, trace
+
+        # Initialize Opper client
+        self._opper = AsyncOpper()
+        self.run_agent = trace(name="agent_runner.run_agent")(self.run_agent)
+
         self.tools = {}
+        # Tool name -> function projecting its result into the observation the LLM sees
+        self._observation_projections: Dict[str, Callable[[Any], Any]] = {}
+        # Tool name -> names of input fields typed as Pydantic models
+        self._tool_model_fields: Dict[str, Set[str]] = {}
         self.max_steps = 15
+        # Minimum reasoning confidence for keeping a speculative action that
+        # matches the tool the reasoning intends to use
+        self.speculation_min_confidence = 0.5
+        # Reasoning confidence above which action selection may only finish
+        self.finish_confidence_threshold = 0.95
+        # Consecutive steps below this reasoning confidence before giving up
+        self.low_confidence_threshold = 0.2
+        self.low_confidence_patience = 2
+        # Cycles allowed to pick an invalid action or unknown tool before the run is aborted
+        self.max_invalid_tool_retries = 2
+        # History records kept before the log is collapsed into one record
+        self.max_history_records = 8
+        # Action model whose tool_name is restricted to the registered tools
+        self._action_model: Type[AgentAction] = AgentAction
 
     def register_tools(self, tools: Dict[str, Any]) -> None:
-        """Register tools that the agent can use."""
-        self.tools = tools
+        """Register tools that the agent can use.
+
+        Each value is either the tool callable or a ``(callable, input_schema)``
+        pair, where ``input_schema`` is the Pydantic model for the tool's params.
+        """
+        self.tools = {}
+        self._tool_model_fields = {}
+        for name, tool in tools.items():
+            if isinstance(tool, tuple):
+                tool, input_schema = tool
+                self._tool_model_fields[name] = _model_fields(input_schema)
+            self.tools[name] = tool
+
+        if self.tools:
+            tool_names = tuple(self.tools.keys())
+            self._action_model = create_model(
+                "AgentAction",
+                __base__=AgentAction,
+                tool_name=(
+                    Optional[Literal[tool_names]],
+                    Field(None, description="Name of the tool to use"),
+                ),
+            )
+        else:
+            self._action_model = AgentAction
         logger.info(f"Registered {len(tools)} tools: {', '.join(tools.keys())}")
 
-    @trace(name="agent_runner.run_agent")
+    def register_observation_projection(
+        self, tool_name: str, projection: Callable[[Any], Any]
+    ) -> None:
+        """Register how a tool's result is condensed into the observation for the LLM.
+
+        Tools without a projection have any string longer than 2 KB trimmed to a
+        head/tail preview.
+        """
+        self._observation_projections[tool_name] = projection
+
+    async def run_agent_batch(
+        self,
+        jobs: List[Tuple[str, Dict[str, Any], Dict[str, Any]]],
+        max_concurrency: int = 8,
+    ) -> List[Dict[str, Any]]:
+        """Run several agents concurrently.
+
+        Args:
+            jobs: (agent_id, agent, input_data) tuples, one per agent run.
+            max_concurrency: Maximum number of agents running at once.
+
+        Returns:
+            The result of each run, in the same order as ``jobs``.
+        """
+        if max_concurrency < 1:
+            raise ValueError(
+                f"max_concurrency must be at least 1, got {max_concurrency}"
+            )
+        sem = asyncio.Semaphore(max_concurrency)
+
+        async def _bounded(
+            job: Tuple[str, Dict[str, Any], Dict[str, Any]],
+        ) -> Dict[str, Any]:
+            agent_id, agent, input_data = job
+            async with sem:
+                try:
+                    return await self.run_agent(agent_id, agent, input_data)
+                except Exception as e:
+                    logger.error(f"Error running agent {agent_id}: {e}")
+                    return {"error": f"Error running the agent: {str(e)}"}
+
+        return await asyncio.gather(*[_bounded(job) for job in jobs])
+
     async def run_agent(
         self, agent_id: str, agent: Dict[str, Any], input_data: Dict[str, Any]
     ) -> Dict[str, Any]:
         """Run an agent with the given input data."""
         # Keep reference to the root span
-        root_span = opper.traces.current_span
+        root_span = self._opper.traces.current_span
         root_span_id = root_span.uuid
         logger.info(f"Root span ID: {root_span_id}")
 
@@ -110,9 +382,24 @@ class AgentRunnerService:
             "input": input_data,
             "thoughts": [],
             "current_step": 0,
-            "intermediate_results": {},
+            # Summaries of completed tool steps, used for the speculative action
+            # hint and to tell whether any tool results are in yet
+            "memento_trail": [],
+            # Append-only log of completed cycles, so the serialized prompt prefix
+            # stays byte-identical across cycles and provider prompt caches can hit
+            "history": [],
         }
 
+        context_json = _ContextJSON(input_data)
+
+        # Results of tool calls already made this session and their summaries,
+        # keyed by tool and params
+        tool_cache: Dict[Tuple[str, bytes], Tuple[Any, str]] = {}
+        # Number of consecutive steps with low reasoning confidence
+        low_conf_streak = 0
+        # Number of cycles that selected an invalid action or unregistered tool
+        invalid_tool_retries = 0
+
         # Get verbose setting from agent config
         verbose = agent.get("verbose", False)
         current_step = 0
@@ -122,67 +409,142 @@ class AgentRunnerService:
             context["current_step"] = current_step
 
             # Start a span for this ReAct cycle
-            async with opper.traces.start(
+            async with self._opper.traces.start(
                 name=f"react_cycle_{current_step}"
             ) as cycle_span:
-                # Add the context as input to the cycle span
-                await cycle_span.update(input=to_json_str(context))
-
-                # Step 1: REASONING - Analyze the current state
-                reasoning = await self._react_reasoning(agent, context)
-                if verbose:
-                    print(f"\n=== Step {current_step} - REASONING ===")
-                    print(reasoning.content)
-                    print(f"Confidence: {reasoning.confidence:.2f}")
-
-                # Save confidence as a metric
-                await cycle_span.save_metric(
-                    dimension="reasoning_confidence",
-                    value=reasoning.confidence,
-                    comment=f"Agent's confidence in its reasoning for step {current_step}",
-                )
-
-                # Step 2: ACTION SELECTION - Select the next action
-                action = await self._react_action_selection(agent, context, reasoning)
-                if verbose and action.tool_name:
-                    print(f"\n=== Step {current_step} - ACTION ===")
-                    print(f"Selected tool: {action.tool_name}")
-                    print(f"Parameters: {action.tool_params or {}}")
-
-                # If the action is to finish, we're done
-                if action.action_type == "finish":
-                    if verbose:
-                        print("\n=== FINISHED ===")
-
-                    final_output = action.output or {}
-
-                    # Log the final output for debugging
-                    logger.info(f"Final output: {final_output}")
-
-                    # Update cycle span with the final output
-                    await cycle_span.update(output=to_json_str(final_output))
+                # Span updates are independent of the LLM calls, so they are
+                # collected here and flushed together at the end of the cycle
+                pending_span_ops: List[Awaitable[Any]] = []
+                try:
+                    # Add the context as input to the cycle span
+                    pending_span_ops.append(
+                        cycle_span.update(input=context_json.render(context))
+                    )
+
+                    # Speculatively start ACTION SELECTION alongside reasoning, using
+                    # the previous step's memento as a stand-in for the reasoning
+                    speculative_action = None
+                    if context["memento_trail"]:
+                        speculative_action = asyncio.create_task(
+                            self._react_action_selection(
+                                agent,
+                                context,
+                                reasoning_hint=context["memento_trail"][-1],
+                            )
+                        )
 
-                    # Update root span with the final output directly using our saved reference
+                    # Step 1: REASONING - Analyze the current state
                     try:
-                        await root_span.update(output=to_json_str(final_output))
-                        logger.info(
-                            f"Updated root span {root_span_id} with final output"
+                        reasoning = await self._react_reasoning(agent, context)
+                    except BaseException:
+                        if speculative_action is not None:
+                            await _cancel_task(speculative_action)
+                        raise
+                    if verbose:
+                        print(f"\n=== Step {current_step} - REASONING ===")
+                        print(reasoning.content)
+                        print(f"Confidence: {reasoning.confidence:.2f}")
+
+                    # Save confidence as a metric
+                    pending_span_ops.append(
+                        cycle_span.save_metric(
+                            dimension="reasoning_confidence",
+                            value=reasoning.confidence,
+                            comment=f"Agent's confidence in its reasoning for step {current_step}",
                         )
-                    except Exception as e:
-                        logger.error(f"Error updating root span: {e}")
+                    )
+
+                    # Give up if the agent has been lost for several cycles in a row
+                    if reasoning.confidence < self.low_confidence_threshold:
+                        low_conf_streak += 1
+                    else:
+                        low_conf_streak = 0
+                    if low_conf_streak >= self.low_confidence_patience:
+                        if speculative_action is not None:
+                            await _cancel_task(speculative_action)
+                        error = (
+                            f"Reasoning confidence below {self.low_confidence_threshold} "
+                            f"for {low_conf_streak} consecutive steps"
+                        )
+                        logger.warning(error)
+                        error_result = {
+                            "error": error,
+                            "status": "insufficient_confidence",
+                        }
 
-                    return final_output
+                        # Update root span with the error directly
+                        try:
+                            await root_span.update(output=to_json_str(error_result))
+                        except Exception as e:
+                            logger.error(f"Error updating root span: {e}")
 
-                # Step 3: OBSERVATION - Execute the selected tool
-                if action.action_type == "use_tool" and action.tool_name:
-                    tool_name = action.tool_name
-                    tool_params = action.tool_params or {}
+                        return error_result
 
-                    # Execute the tool
-                    if tool_name not in self.tools:
-                        error = f"Tool '{tool_name}' not found. Available tools: {list(self.tools.keys())}"
-                        logger.error(error)
-                        error_result = {"error": error}
+                    # Step 2: ACTION SELECTION - When the reasoning is confident and
+                    # tool results are in, only ask for the final review; otherwise
+                    # keep the speculative action only if it agrees with the reasoning
+                    invalid_action_error = None
+                    try:
+                        if (
+                            reasoning.confidence > self.finish_confidence_threshold
+                            and context["memento_trail"]
+                        ):
+                            if speculative_action is not None:
+                                await _cancel_task(speculative_action)
+                            action = await self._react_action_selection(
+                                agent, context, reasoning, finish_only=True
+                            )
+                        elif speculative_action is not None and (
+                            reasoning.confidence >= self.speculation_min_confidence
+                            and reasoning.next_action_type == "use_tool"
+                        ):
+                            try:
+                                action = await speculative_action
+                            except ValidationError:
+                                # A failed speculation falls back to normal selection
+                                action = None
+                            if action is None or not self._speculation_matches(
+                                action, reasoning
+                            ):
+                                action = await self._react_action_selection(
+                                    agent, context, reasoning
+                                )
+                        else:
+                            if speculative_action is not None:
+                                await _cancel_task(speculative_action)
+                            action = await self._react_action_selection(
+                                agent, context, reasoning
+                            )
+                    except ValidationError as e:
+                        # The model picked an action outside the schema, e.g. a tool
+                        # name that isn't registered
+                        action = None
+                        invalid_action_error = f"Selected action is invalid: {e}. Available tools: {list(self.tools.keys())}"
+                    else:
+                        if (
+                            action.action_type == "use_tool"
+                            and action.tool_name
+                            and action.tool_name not in self.tools
+                        ):
+                            invalid_action_error = f"Tool '{action.tool_name}' not found. Available tools: {list(self.tools.keys())}"
+
+                    if invalid_action_error is not None:
+                        logger.error(invalid_action_error)
+
+                        # Let the agent correct itself on the next cycle
+                        invalid_tool_retries += 1
+                        if invalid_tool_retries <= self.max_invalid_tool_retries:
+                            context["last_observation"] = invalid_action_error
+                            self._append_history(
+                                context,
+                                current_step,
+                                reasoning,
+                                action,
+                                invalid_action_error,
+                            )
+                            continue
+
+                        error_result = {"error": invalid_action_error}
 
                         # Update root span with the error directly
                         try:
@@ -192,39 +554,109 @@ class AgentRunnerService:
 
                         return error_result
 
-                    try:
-                        # Check if we have a Pydantic model in the parameters
-                        # that needs to be converted to a dict
-                        for key, value in tool_params.items():
-                            if hasattr(value, "model_dump"):
-                                tool_params[key] = value.model_dump()
-
-                        # Execute the tool
-                        result = await self.tools[tool_name](tool_params)
+                    if verbose and action.tool_name:
+                        print(f"\n=== Step {current_step} - ACTION ===")
+                        print(f"Selected tool: {action.tool_name}")
+                        print(f"Parameters: {action.tool_params or {}}")
 
-                        observation = str(result)
+                    # If the action is to finish, we're done
+                    if action.action_type == "finish":
                         if verbose:
-                            print(f"\n=== Step {current_step} - OBSERVATION ===")
-                            print(observation)
+                            print("\n=== FINISHED ===")
 
-                        # Update cycle span with the observation result
-                        await cycle_span.update(output=to_json_str(result))
-                    except Exception as e:
-                        error = f"Error executing tool {tool_name}: {str(e)}"
-                        logger.error(error)
-                        error_result = {"error": error}
+                        final_output = action.output or {}
 
-                        # Update root span with the error directly
+                        # Log the final output for debugging
+                        logger.info(f"Final output: {final_output}")
+
+                        # Update cycle span with the final output
+                        pending_span_ops.append(
+                            cycle_span.update(output=to_json_str(final_output))
+                        )
+
+                        # Update root span with the final output directly using our saved reference
                         try:
-                            await root_span.update(output=to_json_str(error_result))
+                            await root_span.update(output=to_json_str(final_output))
+                            logger.info(
+                                f"Updated root span {root_span_id} with final output"
+                            )
                         except Exception as e:
                             logger.error(f"Error updating root span: {e}")
 
-                        return error_result
+                        return final_output
+
+                    # Step 3: OBSERVATION - Execute the selected tool
+                    if action.action_type == "use_tool" and action.tool_name:
+                        tool_name = action.tool_name
+                        tool_params = action.tool_params or {}
 
-                    # Update context with observation
-                    context["last_observation"] = observation
-                    context["intermediate_results"][f"step_{current_step}"] = result
+                        try:
+                            # Convert Pydantic models in the parameters to dicts,
+                            # checking only the fields the tool schema declares as
+                            # models when one was registered
+                            model_fields = self._tool_model_fields.get(tool_name)
+                            if model_fields is None:
+                                model_fields = tool_params.keys()
+                            for key in model_fields:
+                                value = tool_params.get(key)
+                                if hasattr(value, "model_dump"):
+                                    tool_params[key] = value.model_dump()
+
+                            # Reuse the result if this exact call already ran this session
+                            cache_key = (
+                                tool_name,
+                                orjson.dumps(
+                                    tool_params, default=str, option=orjson.OPT_SORT_KEYS
+                                ),
+                            )
+                            summary = None
+                            if cache_key in tool_cache:
+                                result, summary = tool_cache[cache_key]
+                                if isinstance(result, dict):
+                                    result = {**result, "_cached": True}
+                            else:
+                                # Execute the tool
+                                result = await self.tools[tool_name](tool_params)
+
+                            projection = self._observation_projections.get(
+                                tool_name, _trim_long_strings
+                            )
+                            # Kept as a dict so the SDK serializes it once for the prompt
+                            observation = projection(result)
+                            if verbose:
+                                print(f"\n=== Step {current_step} - OBSERVATION ===")
+                                print(_json_fragment(observation))
+
+                            # Update cycle span with the observation result
+                            pending_span_ops.append(
+                                cycle_span.update(output=to_json_str(result))
+                            )
+                        except Exception as e:
+                            error = f"Error executing tool {tool_name}: {str(e)}"
+                            logger.error(error)
+                            error_result = {"error": error}
+
+                            # Update root span with the error directly
+                            try:
+                                await root_span.update(output=to_json_str(error_result))
+                            except Exception as e:
+                                logger.error(f"Error updating root span: {e}")
+
+                            return error_result
+
+                        # Update context with the observation and a summary of it
+                        context["last_observation"] = observation
+                        if summary is None:
+                            summary = await self._summarize_step(current_step, result)
+                            if not (isinstance(result, dict) and "error" in result):
+                                tool_cache[cache_key] = (result, summary)
+                        memento = f"step_{current_step}: {summary}"
+                        context["memento_trail"].append(memento)
+                        self._append_history(
+                            context, current_step, reasoning, action, memento
+                        )
+                finally:
+                    await asyncio.gather(*pending_span_ops)
 
         # If we reach here, we hit the maximum steps
         error = f"Reached maximum number of steps ({self.max_steps})"
@@ -243,84 +675,126 @@ class AgentRunnerService:
         self, agent: Dict[str, Any], context: Dict[str, Any]
     ) -> AgentReasoning:
         """Generate reasoning based on the current context."""
-        # Static instructions for the reasoning step in the ReAct pattern
-        reasoning_instructions = """
-        You are in the REASONING phase of a ReAct (Reasoning-Acting-Observation) loop.
-        
-        In this phase, you should:
-        1. Analyze the current state and context
-        2. Think step-by-step about what you know and what you need to find out
-        3. Consider what tools or actions might be helpful
-        4. Determine your next steps
-        
-        Your reasoning should be thorough, logical, and clear. It will be used to decide 
-        what action to take next in the ReAct loop.
-        
-        Additionally, you should provide a confidence score from 0.0 to 1.0 indicating how
-        confident you are in your reasoning:
-        - 0.0-0.3: Low confidence - you have very limited information and high uncertainty
-        - 0.4-0.7: Medium confidence - you have some information but still have uncertainties
-        - 0.8-1.0: High confidence - you have sufficient information to make a well-informed decision
-        
-        This confidence score helps track the quality of the decision-making process.
-        """
-
         # Include the agent's task-specific instructions in the input data
-        result, _ = await opper.call(
+        result, _ = await self._opper.call(
             name="agent_reasoning",
-            instructions=reasoning_instructions,
+            instructions=_REASONING_INSTRUCTIONS,
             input={
                 "agent_instructions": agent.get("instructions", ""),
-                "context": context,
+                "input": context["input"],
+                "history": context.get("history", []),
                 "step_number": context.get("current_step", 0),
-                "last_observation": context.get("last_observation", None),
+                "new_observation": context.get("last_observation", None),
             },
             output_type=AgentReasoning,
         )
         return result
 
     async def _react_action_selection(
-        self, agent: Dict[str, Any], context: Dict[str, Any], reasoning: AgentReasoning
+        self,
+        agent: Dict[str, Any],
+        context: Dict[str, Any],
+        reasoning: Optional[AgentReasoning] = None,
+        reasoning_hint: Optional[str] = None,
+        finish_only: bool = False,
     ) -> AgentAction:
-        """Select the next action based on reasoning."""
-        # Get the list of available tools
-        available_tools = list(self.tools.keys())
-
-        # Static instructions for the action selection step in the ReAct pattern
-        action_instructions = """
-        You are in the ACTION SELECTION phase of a ReAct (Reasoning-Acting-Observation) loop.
-        
-        Based on your prior reasoning, you must now decide on the next action to take.
-        
-        You have two options:
-        1. Use a tool to gather more information or make progress:
-           - action_type: "use_tool"
-           - tool_name: Select from the available tools in the input
-           - tool_params: Provide the necessary parameters for the tool
-           
-        2. Finish the task if you have enough information:
-           - action_type: "finish"
-           - output: Provide your final review with:
-             - review_summary: A concise summary of the PR changes
-             - issues_found: A list of issues or concerns
-             - suggestions: A list of improvement suggestions
-             - overall_assessment: Your final assessment of the PR
-        
-        Choose your action carefully based on your reasoning and the current context.
+        """Select the next action based on reasoning, or on a hint when speculating.
+
+        With ``finish_only`` the model may only finish, which is used when the
+        reasoning is confident enough that another tool call would be wasted.
         """
+        # Get the list of available tools (none when the agent must finish)
+        available_tools = [] if finish_only else list(self.tools.keys())
 
         # Put the available tools and agent instructions in the input data
-        result, _ = await opper.call(
+        result, _ = await self._opper.call(
             name="agent_action",
-            instructions=action_instructions,
+            instructions=_ACTION_INSTRUCTIONS,
             input={
-                "reasoning": reasoning.content,
-                "reasoning_confidence": reasoning.confidence,
-                "context": context,
-                "available_tools": available_tools,
                 "agent_instructions": agent.get("instructions", ""),
+                "available_tools": available_tools,
+                "input": context["input"],
+                "history": context.get("history", []),
                 "step_number": context.get("current_step", 0),
+                "new_observation": context.get("last_observation", None),
+                "reasoning": reasoning.content if reasoning else reasoning_hint,
+                "reasoning_confidence": reasoning.confidence if reasoning else None,
             },
-            output_type=AgentAction,
+            output_type=FinishAction if finish_only else self._action_model,
         )
+        if finish_only:
+            return AgentAction(action_type="finish", output=result.output.model_dump())
         return result
+
+    def _speculation_matches(
+        self, action: AgentAction, reasoning: AgentReasoning
+    ) -> bool:
+        """Whether a speculative action is the tool call the reasoning settled on.
+
+        Both the tool and its params must match, since the params were chosen
+        before the reasoning ran. Speculative finishes are never kept, since the
+        final review has to be written from the current reasoning.
+        """
+        if not (
+            action.action_type == "use_tool"
+            and reasoning.next_action_type == "use_tool"
+            and action.tool_name is not None
+            and action.tool_name == reasoning.next_tool_name
+            and reasoning.next_tool_params is not None
+        ):
+            return False
+        return orjson.dumps(
+            action.tool_params or {}, default=str, option=orjson.OPT_SORT_KEYS
+        ) == orjson.dumps(
+            reasoning.next_tool_params, default=str, option=orjson.OPT_SORT_KEYS
+        )
+
+    def _append_history(
+        self,
+        context: Dict[str, Any],
+        step: int,
+        reasoning: AgentReasoning,
+        action: Optional[AgentAction],
+        observation_summary: str,
+    ) -> None:
+        """Append a completed cycle to the history, collapsing it when it grows too long."""
+        history = context["history"]
+        history.append(
+            {
+                "step": step,
+                "reasoning": reasoning.content,
+                "action": {
+                    "tool_name": action.tool_name if action else None,
+                    "tool_params": action.tool_params if action else None,
+                },
+                "observation_summary": observation_summary,
+            }
+        )
+        if len(history) > self.max_history_records:
+            # Past this size the ever-longer prefix costs more than the cache saves,
+            # so restart the log from a single record holding the summaries so far
+            summaries: List[str] = []
+            for record in history:
+                summary = record["observation_summary"]
+                summaries.extend(summary if isinstance(summary, list) else [summary])
+            first_step = str(history[0]["step"]).split("-")[0]
+            context["history"] = [
+                {
+                    "step": f"{first_step}-{step}",
+                    "observation_summary": summaries,
+                }
+            ]
+
+    async def _summarize_step(self, step_idx: int, result: Any) -> str:
+        """Compress a step's tool result into a short summary for later prompts."""
+        try:
+            memento, _ = await self._opper.call(
+                name="agent_step_summary",
+                instructions=_SUMMARY_INSTRUCTIONS,
+                input={"step_number": step_idx, "result": result},
+                output_type=StepMemento,
+            )
+            return memento.summary
+        except Exception as e:
+            logger.error(f"Error summarizing step {step_idx}: {e}")
+            return str(result)[:1000]
@@ -4,16 +4,31 @@ GitHub PR review tool for the agent runner system.
 This tool enables agents to fetch and review GitHub pull requests.
 """
 
+import asyncio
+import codecs
 import logging
-from typing import Any, Dict, List, Optional
+import time
+from collections import OrderedDict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
 
-import aiohttp
-from opperai import AsyncOpper, trace
+import orjson
 from pydantic import BaseModel, Field
 
+if TYPE_CHECKING:
+    import aiohttp
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
-opper = AsyncOpper()
 
 
 class GitHubPRToolInput(BaseModel):
@@ -28,6 +43,76 @@ class GitHubPRToolInput(BaseModel):
     )
 
 
+class DiffHunk(NamedTuple):
+    """A single hunk of a unified diff."""
+
+    file: str
+    header: str
+    body: str
+    added_lines: int
+    removed_lines: int
+
+
+class _DiffParser:
+    """Line-state parser that turns a unified diff into hunks as text is fed in."""
+
+    def __init__(self):
+        self.hunks: List[DiffHunk] = []
+        self._pending = ""
+        self._file = ""
+        self._header: Optional[str] = None
+        self._body: List[str] = []
+        self._added = 0
+        self._removed = 0
+
+    def feed(self, text: str) -> None:
+        """Consume a chunk of diff text, which may end mid-line."""
+        lines = (self._pending + text).split("\n")
+        self._pending = lines.pop()
+        for line in lines:
+            self._feed_line(line)
+
+    def close(self) -> List[DiffHunk]:
+        """Flush any buffered text and return the parsed hunks."""
+        if self._pending:
+            self._feed_line(self._pending)
+            self._pending = ""
+        self._flush_hunk()
+        return self.hunks
+
+    def _feed_line(self, line: str) -> None:
+        if line.startswith("diff --git "):
+            self._flush_hunk()
+            # "diff --git a/<path> b/<path>": keep the post-image path
+            _, _, path = line.partition(" b/")
+            self._file = path or line[len("diff --git ") :]
+        elif line.startswith("@@"):
+            self._flush_hunk()
+            self._header = line
+        elif self._header is not None:
+            self._body.append(line)
+            if line.startswith("+"):
+                self._added += 1
+            elif line.startswith("-"):
+                self._removed += 1
+
+    def _flush_hunk(self) -> None:
+        if self._header is not None:
+            self.hunks.append(
+                DiffHunk(
+                    file=self._file,
+                    header=self._header,
+                    body="\n".join(self._body),
+                    added_lines=self._added,
+                    removed_lines=self._removed,
+                )
+            )
+        self._header = None
+        self._body = []
+        self._added = 0
+        self._removed = 0
+
+
 class GitHubPRTool:
     """Tool for interacting with GitHub PRs."""
 
@@ -38,18 +123,47 @@ class GitHubPRTool:
             github_token: Optional GitHub personal access token. If not provided,
                         only public repositories will be accessible with rate limits.
         """
+        # Import opperai here rather than at module level to keep startup fast
+        from opperai import AsyncOpper, trace
+
+        self._opper = AsyncOpper()
+        self.execute = trace(name="github_pr_tool.execute")(self.execute)
+
         self.base_url = "https://api.github.com"
         self.headers = {
             "Accept": "application/vnd.github.v3+json",
         }
         if github_token:
             self.headers["Authorization"] = f"token {github_token}"
+        self._session: Optional["aiohttp.ClientSession"] = None
+        # LRU cache of GitHub responses: key -> (expiry_ts, payload, etag)
+        self._cache: "OrderedDict[Tuple, Tuple[float, Any, str]]" = OrderedDict()
+        self.cache_ttl = 60.0
+        self.cache_max_entries = 128
+
+    async def _get_session(self) -> "aiohttp.ClientSession":
+        """Get the shared HTTP session, creating it on first use."""
+        if self._session is None or self._session.closed:
+            import aiohttp
+
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(limit=20, ttl_dns_cache=300),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """Close the shared HTTP session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
 
-    @trace(name="github_pr_tool.execute")
     async def execute(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Execute the GitHub PR tool."""
+        import aiohttp
+
         # Record the input parameters in the span
-        await opper.traces.current_span.update(input=str(params))
+        await self._opper.traces.current_span.update(input=str(params))
 
         try:
             # Check for required parameters
@@ -62,14 +176,26 @@ class GitHubPRTool:
                     "status": "error",
                 }
                 # Record the error output in the span
-                await opper.traces.current_span.update(output=str(error_result))
+                await self._opper.traces.current_span.update(output=str(error_result))
                 return error_result
 
-            # Get PR information
-            pr_info = await self._get_pr_info(
-                params["owner"], params["repo"], params["pr_number"]
+            owner, repo, pr_number = (
+                params["owner"],
+                params["repo"],
+                params["pr_number"],
             )
 
+            # Fetch PR information, files and diff concurrently
+            pr_info, files, diff = await asyncio.gather(
+                self._get_pr_info(owner, repo, pr_number),
+                self._get_pr_files(owner, repo, pr_number),
+                self._get_pr_diff(owner, repo, pr_number),
+                return_exceptions=True,
+            )
+
+            if isinstance(pr_info, BaseException):
+                raise pr_info
+
             # Check if repository is private and we're not authenticated
             if pr_info.get("private", False) and "Authorization" not in self.headers:
                 error_result = {
@@ -77,16 +203,12 @@ class GitHubPRTool:
                     "status": "error",
                 }
                 # Record the error output in the span
-                await opper.traces.current_span.update(output=str(error_result))
+                await self._opper.traces.current_span.update(output=str(error_result))
                 return error_result
 
-            # Get PR files and diff
-            files = await self._get_pr_files(
-                params["owner"], params["repo"], params["pr_number"]
-            )
-            diff = await self._get_pr_diff(
-                params["owner"], params["repo"], params["pr_number"]
-            )
+            for fetched in (files, diff):
+                if isinstance(fetched, BaseException):
+                    raise fetched
 
             # Build the result
             result = {
@@ -95,7 +217,7 @@ class GitHubPRTool:
                 "changed_files": [f["filename"] for f in files],
                 "additions": pr_info["additions"],
                 "deletions": pr_info["deletions"],
-                "diff": self._truncate_diff(diff),
+                "diff": self._truncate_diff(diff, params.get("focus_area")),
                 "pr_description": pr_info["body"] or "",
                 "pr_url": pr_info["html_url"],
                 "repository_private": pr_info.get("private", False),
@@ -103,7 +225,7 @@ class GitHubPRTool:
             }
 
             # Record the output result in the span
-            await opper.traces.current_span.update(output=str(result))
+            await self._opper.traces.current_span.update(output=str(result))
             return result
         except aiohttp.ClientResponseError as e:
             error_msg = str(e)
@@ -115,7 +237,7 @@ class GitHubPRTool:
             error_result = {"error": error_msg, "status": "error"}
 
             # Record the error output in the span
-            await opper.traces.current_span.update(output=str(error_result))
+            await self._opper.traces.current_span.update(output=str(error_result))
             return error_result
         except Exception as e:
             logger.error(f"Error executing GitHub PR tool: {e}", exc_info=True)
@@ -125,40 +247,191 @@ class GitHubPRTool:
             }
 
             # Record the error output in the span
-            await opper.traces.current_span.update(output=str(error_result))
+            await self._opper.traces.current_span.update(output=str(error_result))
             return error_result
 
+    @staticmethod
+    def project_observation(
+        result: Dict[str, Any],
+        max_hunk_length: int = 1000,
+        max_digest_length: int = 8000,
+    ) -> Dict[str, Any]:
+        """Condense a tool result into the fields the agent reasons over.
+
+        The diff is reduced to a digest of hunk headers per file plus shortened
+        previews of hunk bodies, together bounded by ``max_digest_length``.
+        """
+        if result.get("status") != "success":
+            return result
+
+        diff = result["diff"]
+        budget = max_digest_length
+        truncated = diff["truncated"]
+
+        # Hunk headers per file first, as they outline the whole change cheaply
+        headers_by_file: Dict[str, List[str]] = {}
+        for file, header in zip(diff["files"], diff["headers"]):
+            cost = len(header) + (0 if file in headers_by_file else len(file))
+            if cost > budget:
+                truncated = True
+                break
+            headers_by_file.setdefault(file, []).append(header)
+            budget -= cost
+
+        # Then body previews, in order, while the budget lasts
+        previews = []
+        for file, header, body in zip(diff["files"], diff["headers"], diff["bodies"]):
+            if len(body) > max_hunk_length:
+                body = body[:max_hunk_length] + "\n... (hunk truncated)"
+            cost = len(file) + len(header) + len(body)
+            if cost > budget:
+                truncated = True
+                break
+            previews.append({"file": file, "header": header, "body": body})
+            budget -= cost
+
+        return {
+            "pr_title": result["pr_title"],
+            "changed_files": result["changed_files"],
+            "additions": result["additions"],
+            "deletions": result["deletions"],
+            "diff_digest": {
+                "hunk_headers": headers_by_file,
+                "previews": previews,
+                "truncated": truncated,
+            },
+            **({"_cached": True} if result.get("_cached") else {}),
+        }
+
+    async def _cached_get(
+        self,
+        key: Tuple,
+        url: str,
+        read: Callable[["aiohttp.ClientResponse"], Awaitable[Any]],
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Any:
+        """GET a URL, serving fresh hits from the cache and revalidating with ETags."""
+        cached = self._cache.get(key)
+        if cached is not None:
+            expiry, payload, etag = cached
+            self._cache.move_to_end(key)
+            if time.monotonic() < expiry:
+                return payload
+            headers = {**(headers or {}), "If-None-Match": etag}
+
+        session = await self._get_session()
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304 and cached is not None:
+                # Not modified: refresh the TTL (304s don't count against the rate limit)
+                payload, etag = cached[1], cached[2]
+            else:
+                response.raise_for_status()
+                payload = await read(response)
+                etag = response.headers.get("ETag")
+
+        if etag:
+            self._cache[key] = (time.monotonic() + self.cache_ttl, payload, etag)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_max_entries:
+                self._cache.popitem(last=False)
+        return payload
+
     async def _get_pr_info(
         self, owner: str, repo: str, pr_number: int
     ) -> Dict[str, Any]:
         """Get information about a pull request."""
-        async with aiohttp.ClientSession() as session:
-            url = f"{self.base_url}/repos/{owner}/{repo}/pulls/{pr_number}"
-            async with session.get(url, headers=self.headers) as response:
-                response.raise_for_status()
-                return await response.json()
+        url = f"{self.base_url}/repos/{owner}/{repo}/pulls/{pr_number}"
+        return await self._cached_get(
+            ("info", owner, repo, pr_number), url, self._read_json
+        )
 
     async def _get_pr_files(
         self, owner: str, repo: str, pr_number: int
     ) -> List[Dict[str, Any]]:
         """Get files changed in a pull request."""
-        async with aiohttp.ClientSession() as session:
-            url = f"{self.base_url}/repos/{owner}/{repo}/pulls/{pr_number}/files"
-            async with session.get(url, headers=self.headers) as response:
-                response.raise_for_status()
-                return await response.json()
-
-    async def _get_pr_diff(self, owner: str, repo: str, pr_number: int) -> str:
-        """Get the diff of a pull request."""
-        async with aiohttp.ClientSession() as session:
-            url = f"{self.base_url}/repos/{owner}/{repo}/pulls/{pr_number}"
-            headers = {**self.headers, "Accept": "application/vnd.github.v3.diff"}
-            async with session.get(url, headers=headers) as response:
-                response.raise_for_status()
-                return await response.text()
+        url = f"{self.base_url}/repos/{owner}/{repo}/pulls/{pr_number}/files"
+        return await self._cached_get(
+            ("files", owner, repo, pr_number), url, self._read_json
+        )
+
+    async def _get_pr_diff(
+        self, owner: str, repo: str, pr_number: int
+    ) -> List[DiffHunk]:
+        """Get the diff of a pull request, parsed into hunks."""
+        url = f"{self.base_url}/repos/{owner}/{repo}/pulls/{pr_number}"
+        headers = {"Accept": "application/vnd.github.v3.diff"}
+        return await self._cached_get(
+            ("diff", owner, repo, pr_number), url, self._read_diff_hunks, headers
+        )
 
-    def _truncate_diff(self, diff: str, max_length: int = 50000) -> str:
-        """Truncate the diff if it's too long."""
-        if len(diff) > max_length:
-            return diff[:max_length] + "\n... (diff truncated for length)"
-        return diff
+    async def _read_json(self, response: "aiohttp.ClientResponse") -> Any:
+        """Decode a JSON response with orjson."""
+        return await response.json(loads=orjson.loads)
+
+    async def _read_diff_hunks(
+        self, response: "aiohttp.ClientResponse"
+    ) -> List[DiffHunk]:
+        """Parse a diff response into hunks as it streams in."""
+        parser = _DiffParser()
+        decoder = codecs.getincrementaldecoder(response.charset or "utf-8")(
+            errors="replace"
+        )
+        async for chunk in response.content.iter_chunked(8192):
+            parser.feed(decoder.decode(chunk))
+        parser.feed(decoder.decode(b"", final=True))
+        return parser.close()
+
+    def _truncate_diff(
+        self,
+        hunks: List[DiffHunk],
+        focus_area: Optional[str] = None,
+        max_length: int = 50000,
+    ) -> Dict[str, Any]:
+        """Lay out the most relevant hunks that fit the length budget as parallel columns.
+
+        Hunks that mention the focus area rank first, then larger hunks by
+        changed lines. They are packed best-first until the budget is used and
+        emitted in their original diff order; if even the best hunk is over
+        budget, its body is cut to fit.
+        """
+        keywords = (focus_area or "").lower().split()
+
+        def score(index: int) -> Tuple[float, float]:
+            hunk = hunks[index]
+            relevance = 1.0
+            if keywords:
+                text = f"{hunk.file}\n{hunk.header}\n{hunk.body}".lower()
+                relevance = 1.0 if any(k in text for k in keywords) else 0.1
+            size_factor = min(1.0, (hunk.added_lines + hunk.removed_lines) / 50)
+            return relevance, size_factor
+
+        marker = "\n... (hunk truncated for length)"
+        selected = []
+        bodies: Dict[int, str] = {}
+        total = 0
+        for index in sorted(range(len(hunks)), key=score, reverse=True):
+            hunk = hunks[index]
+            size = len(hunk.header) + len(hunk.body)
+            if total + size <= max_length:
+                bodies[index] = hunk.body
+            elif not selected:
+                # The best hunk alone is over budget (e.g. a large new file), so
+                # keep as much of it as fits rather than dropping the whole diff
+                room = max_length - len(hunk.header) - len(marker)
+                if room <= 0:
+                    continue
+                bodies[index] = hunk.body[:room] + marker
+                size = max_length
+            else:
+                continue
+            selected.append(index)
+            total += size
+        selected.sort()
+
+        return {
+            "files": [hunks[i].file for i in selected],
+            "headers": [hunks[i].header for i in selected],
+            "bodies": [bodies[i] for i in selected],
+            "truncated": len(selected) < len(hunks)
+            or any(bodies[i] is not hunks[i].body for i in selected),
+        }
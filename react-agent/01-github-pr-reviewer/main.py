@@ -6,18 +6,15 @@ import argparse
 import asyncio
 import logging
 import os
+from typing import Any, Dict, List
 
 from agent_runner import AgentRunnerService
-from dotenv import load_dotenv
-from github_pr_tool import GitHubPRTool
+from github_pr_tool import GitHubPRTool, GitHubPRToolInput
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
-
 # Agent configuration
 PR_REVIEW_AGENT = {
     "instructions": """
@@ -38,20 +35,96 @@ PR_REVIEW_AGENT = {
 }
 
 
+def parse_prs_file(path: str) -> List[Dict[str, Any]]:
+    """Read PRs to review from a file with one OWNER/REPO#PR_NUMBER per line."""
+    prs = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            repo_path, _, pr_number = line.rpartition("#")
+            owner, _, repo = repo_path.partition("/")
+            if not owner or not repo or not pr_number.isdigit():
+                raise ValueError(f"Invalid PR reference: {line!r}")
+            prs.append({"owner": owner, "repo": repo, "pr_number": int(pr_number)})
+    return prs
+
+
+def print_review(result: Dict[str, Any]) -> None:
+    """Print a PR review result."""
+    # Check for errors
+    if "error" in result:
+        print(f"Error: {result['error']}")
+        return
+
+    # Print the review
+    print("\n=== PR Review Results ===")
+    print(f"\nSummary: {result.get('review_summary', 'No summary provided')}")
+
+    if issues := result.get("issues_found"):
+        print("\nIssues Found:")
+        for issue in issues:
+            print(f"- {issue}")
+
+    if suggestions := result.get("suggestions"):
+        print("\nSuggestions:")
+        for suggestion in suggestions:
+            print(f"- {suggestion}")
+
+    print(
+        f"\nOverall Assessment: {result.get('overall_assessment', 'No assessment provided')}"
+    )
+
+
 async def main():
     # Parse command line arguments
     parser = argparse.ArgumentParser(description="Review a GitHub PR using an AI agent")
 
     # GitHub PR Review command
-    parser.add_argument("owner", help="Repository owner (username or organization)")
-    parser.add_argument("repo", help="Repository name")
-    parser.add_argument("pr_number", type=int, help="Pull request number to review")
+    parser.add_argument(
+        "owner", nargs="?", help="Repository owner (username or organization)"
+    )
+    parser.add_argument("repo", nargs="?", help="Repository name")
+    parser.add_argument(
+        "pr_number", nargs="?", type=int, help="Pull request number to review"
+    )
+    parser.add_argument(
+        "--prs-file",
+        help="File with one OWNER/REPO#PR_NUMBER per line to review concurrently",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=8,
+        help="Maximum number of PRs reviewed at once with --prs-file",
+    )
     parser.add_argument(
         "-v", "--verbose", action="store_true", help="Show agent's thought process"
     )
 
     args = parser.parse_args()
 
+    if args.max_concurrency < 1:
+        parser.error("--max-concurrency must be at least 1")
+
+    if args.prs_file:
+        if args.owner or args.repo or args.pr_number is not None:
+            parser.error("OWNER REPO PR_NUMBER cannot be combined with --prs-file")
+        try:
+            prs = parse_prs_file(args.prs_file)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    elif args.owner and args.repo and args.pr_number is not None:
+        prs = [{"owner": args.owner, "repo": args.repo, "pr_number": args.pr_number}]
+    else:
+        parser.error("provide OWNER REPO PR_NUMBER or --prs-file")
+
+    # Load environment variables
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
     # Initialize services
     agent_runner = AgentRunnerService()
 
@@ -63,48 +136,37 @@ async def main():
     github_pr_tool = GitHubPRTool(github_token)
 
     # Register tools
-    agent_runner.register_tools({"github_pr_tool": github_pr_tool.execute})
-
-    # Prepare input data
-    input_data = {
-        "owner": args.owner,
-        "repo": args.repo,
-        "pr_number": args.pr_number,
-    }
+    agent_runner.register_tools(
+        {"github_pr_tool": (github_pr_tool.execute, GitHubPRToolInput)}
+    )
+    agent_runner.register_observation_projection(
+        "github_pr_tool", GitHubPRTool.project_observation
+    )
 
     try:
+        if args.prs_file:
+            # Run one agent per PR concurrently
+            results = await agent_runner.run_agent_batch(
+                [("github_pr_reviewer", PR_REVIEW_AGENT, pr) for pr in prs],
+                max_concurrency=args.max_concurrency,
+            )
+            for pr, result in zip(prs, results):
+                print(f"\n### {pr['owner']}/{pr['repo']}#{pr['pr_number']}")
+                print_review(result)
+            return
+
         # Run the agent
         result = await agent_runner.run_agent(
             agent_id="github_pr_reviewer",
             agent=PR_REVIEW_AGENT,
-            input_data=input_data,
-        )
-
-        # Check for errors
-        if "error" in result:
-            print(f"Error: {result['error']}")
-            return
-
-        # Print the review
-        print("\n=== PR Review Results ===")
-        print(f"\nSummary: {result.get('review_summary', 'No summary provided')}")
-
-        if issues := result.get("issues_found"):
-            print("\nIssues Found:")
-            for issue in issues:
-                print(f"- {issue}")
-
-        if suggestions := result.get("suggestions"):
-            print("\nSuggestions:")
-            for suggestion in suggestions:
-                print(f"- {suggestion}")
-
-        print(
-            f"\nOverall Assessment: {result.get('overall_assessment', 'No assessment provided')}"
+            input_data=prs[0],
         )
+        print_review(result)
 
     except Exception as e:
         print(f"Error running the agent: {str(e)}")
+    finally:
+        await github_pr_tool.close()
 
 
 if __name__ == "__main__":